@@ -0,0 +1,91 @@
+# encoding: utf-8
+
+"""
+Helpers shared by the automation scripts:
+    1) Downloads with retries and a conditional GET cache
+    2) Locates source folders within the repository
+"""
+
+import os
+import json
+import pathlib
+import time
+import urllib.request
+import urllib.error
+
+CACHE_PATH = pathlib.Path.home().joinpath(".cache", "orbit-swiftui")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+RETRY_BACKOFF_FACTOR = 0.5
+MAX_RETRY_AFTER = 60
+
+IGNORED_FOLDERS = {".git", ".build", "build", "DerivedData", "Pods", "node_modules"}
+
+def retry_delay(attempt, retry_after = None):
+    # Honor the server provided delay in seconds, capped so that a long delay does not stall a CI job, otherwise back off exponentially
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_RETRY_AFTER)
+    return RETRY_BACKOFF_FACTOR * (2 ** attempt)
+
+def urlopen_with_retry(request):
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return urllib.request.urlopen(request)
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt, e.headers.get("Retry-After"))
+        except urllib.error.URLError:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt)
+        time.sleep(delay)
+
+def fetch_cached(url, cache_name):
+    # Conditional GET, the cached body is reused when the server responds with 304 Not Modified
+    body_path = CACHE_PATH.joinpath(cache_name)
+    validators_path = CACHE_PATH.joinpath(f"{cache_name}.validators.json")
+    request = urllib.request.Request(url)
+
+    if body_path.exists() and validators_path.exists():
+        validators = json.loads(validators_path.read_text())
+        if "ETag" in validators:
+            request.add_header("If-None-Match", validators["ETag"])
+        if "Last-Modified" in validators:
+            request.add_header("If-Modified-Since", validators["Last-Modified"])
+
+    try:
+        with urlopen_with_retry(request) as response:
+            body = response.read()
+            validators = { k: response.headers[k] for k in ["ETag", "Last-Modified"] if k in response.headers }
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+        return body_path.read_bytes()
+
+    if validators:
+        CACHE_PATH.mkdir(parents = True, exist_ok = True)
+        body_path.write_bytes(body)
+        validators_path.write_text(json.dumps(validators))
+
+    return body
+
+def find_source_folder(root_path, filename):
+    # The previously found folder is reused as long as it still contains the file
+    cache_path = CACHE_PATH.joinpath("source-folders.json")
+    cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+    cache_key = str(root_path.joinpath(filename))
+    if cache_key in cache and pathlib.Path(cache[cache_key]).joinpath(filename).exists():
+        return pathlib.Path(cache[cache_key])
+
+    for folder, subfolders, filenames in os.walk(root_path):
+        # Skip folders that never contain Orbit sources, but are expensive to traverse
+        subfolders[:] = [f for f in subfolders if f not in IGNORED_FOLDERS]
+        if filename in filenames:
+            cache[cache_key] = folder
+            CACHE_PATH.mkdir(parents = True, exist_ok = True)
+            cache_path.write_text(json.dumps(cache))
+            return pathlib.Path(folder)
+
+    raise FileNotFoundError(f"{filename} not found in {root_path}")
@@ -4,6 +4,22 @@ import os
 import sys
 import subprocess
 import json
+import glob
+import plistlib
+
+DEVICES_PATH = os.path.expanduser("~/Library/Developer/CoreSimulator/Devices")
+
+def find_existing_simulator_on_disk(name, runtime_id):
+    # Reading device plists directly avoids the slow CoreSimulatorService round-trip of `simctl list`
+    for path in glob.iglob(os.path.join(DEVICES_PATH, "*", "device.plist")):
+        try:
+            with open(path, "rb") as device_file:
+                device = plistlib.load(device_file)
+        except (OSError, plistlib.InvalidFileException):
+            continue
+        if device.get("name") == name and device.get("runtime") == runtime_id and not device.get("isDeleted", False):
+            return device.get("UDID")
+    return None
 
 def find_existing_simulator(json, name, runtime_id):
     devices = json["devices"][runtime_id]
@@ -13,24 +29,32 @@ def ios_runtime_id(ios_version):
     # expects iOS version number, e.g. "15.2"
     return "com.apple.CoreSimulator.SimRuntime.iOS-" + "-".join(ios_version.split("."))
 
+def boot_simulator(simulator_id):
+    # boot if needed
+    return subprocess.run(["xcrun", "simctl", "bootstatus", simulator_id, "-b"], stdout=subprocess.PIPE, text=True)
+
 # Returns an ID of a booted simulator matching the specified criteria - either by finding an available one or creating a new one
 def main():
     
     simulator_name = sys.argv[1]
     ios_version = sys.argv[2]
     
+    runtime_id = ios_runtime_id(ios_version)
+    simulator_id = find_existing_simulator_on_disk(simulator_name, runtime_id)
+    
+    # A device whose runtime or device type is no longer supported still has a plist, but fails to boot
+    if simulator_id and boot_simulator(simulator_id).returncode == 0:
+        return simulator_id
+    
     simulators = subprocess.run(["xcrun", "simctl", "list", "-j", "devices", "available"], stdout=subprocess.PIPE, text=True).stdout
     simulators_string = str(simulators).strip()
     simulators_json = json.loads(simulators_string)
-    
-    runtime_id = ios_runtime_id(ios_version)
     simulator_id = find_existing_simulator(simulators_json, simulator_name, runtime_id)
     
     if not simulator_id:        
         simulator_id = subprocess.run(["xcrun", "simctl", "create", simulator_name, simulator_name, f"iOS{ios_version}"], stdout=subprocess.PIPE, text=True).stdout
     
-    # boot if needed
-    subprocess.run(["xcrun", "simctl", "bootstatus", simulator_id, "-b"], stdout=subprocess.PIPE, text=True)
+    boot_simulator(simulator_id)
     
     return simulator_id
 
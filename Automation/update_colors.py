@@ -13,15 +13,23 @@ This script:
 
 import sys
 import os
+import io
 import json
 import re
 import pathlib
 import shutil
 import colorsys
-from urllib.request import urlopen
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from common import CACHE_PATH, fetch_cached, find_source_folder
 
 ORBIT_URL = 'https://unpkg.com/@kiwicom/orbit-design-tokens/output/theo-spec.json'
 ORBIT_COLOR_PREFIX = 'palette'
+CHECKED_STATE_PATH = CACHE_PATH.joinpath('colors-checked-state.json')
+
+camel_case_regex = re.compile(r'[A-Z](?:[a-z]+|[A-Z]*(?=[A-Z]|$))')
+digits_regex = re.compile(r'\d+')
+hexa_components = tuple(f'{i:02X}' for i in range(256))
 
 contents_filename = 'Contents.json'
 
@@ -33,7 +41,9 @@ xcassets_header = '''{
 }
 '''
 
-xcassets_color_template = '''{{
+def xcassets_color_contents(R, G, B, iR, iG, iB):
+  # Formatted by an f-string, which avoids parsing the template for every color
+  return f'''{{
   "colors" : [
     {{
       "color" : {{
@@ -74,9 +84,6 @@ xcassets_color_template = '''{{
 '''
 
 source_filename_plural = f'Colors'
-source_group_template = '\n    // MARK: - {group}'
-source_line_template = '    /// Orbit {description} color.\n    static let {name} = Color("{description}", bundle: .current)'
-source_line_template_uicolor = '    /// Orbit {description} color.\n    static let {name} = fromResource(named: "{description}")'
 source_template = '''import SwiftUI
 
 // Generated by 'Automation/update_colors.py'
@@ -97,10 +104,10 @@ def lowercase_first_letter(s):
   return s[:1].lower() + s[1:] if str else ''
 
 def camel_case_split(str):
-  return re.findall(r'[A-Z](?:[a-z]+|[A-Z]*(?=[A-Z]|$))', str)
+  return camel_case_regex.findall(str)
 
 def str_to_hexa(str):
-  return '{0:0{1}x}'.format(int(str),2).upper()
+  return hexa_components[int(str)]
 
 def get_inversed_colors(colors):
   r, g, b = [float(c)/255.0 for c in colors]
@@ -108,11 +115,44 @@ def get_inversed_colors(colors):
   rgb_inverted = colorsys.hls_to_rgb(h, 1.0 - l, s)
   return [float(c)*255.0 for c in rgb_inverted]
 
-def get_updated_colors():
-  r = urlopen(ORBIT_URL).read()
-  data = json.loads(r)
+def get_updated_colors(spec):
+  data = json.loads(spec)
   return {k: v for k, v in data.items() if k.startswith(ORBIT_COLOR_PREFIX)}
 
+def write_file(path, content):
+  data = memoryview(content.encode())
+  fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+  try:
+    # os.write may write only part of the data, so keep writing the remainder
+    while data:
+      data = data[os.write(fd, data):]
+  finally:
+    os.close(fd)
+
+def write_files(pendingFiles):
+  # Create each folder only once and upfront, so that the concurrent writes do not race on it
+  for folder in sorted({path.parent for path, _ in pendingFiles}):
+    folder.mkdir(parents = True, exist_ok = True)
+
+  # Writes of the small files are dominated by filesystem latency, so overlap them
+  with ThreadPoolExecutor(max_workers = 16) as executor:
+    list(executor.map(lambda pendingFile: write_file(*pendingFile), pendingFiles))
+
+def checked_state(spec, codePaths):
+  # Identifies the design tokens and this generator together with the generated sources that are known to match them
+  return {
+    'spec_hash': hashlib.blake2b(spec).hexdigest(),
+    'generator_hash': hashlib.blake2b(pathlib.Path(__file__).read_bytes()).hexdigest(),
+    'sources_hash': hashlib.blake2b(b''.join(path.read_bytes() for path in codePaths)).hexdigest()
+  }
+
+def is_checked_state_unchanged(state):
+  return CHECKED_STATE_PATH.exists() and json.loads(CHECKED_STATE_PATH.read_text()) == state
+
+def save_checked_state(state):
+  CACHE_PATH.mkdir(parents = True, exist_ok = True)
+  CHECKED_STATE_PATH.write_text(json.dumps(state))
+
 def isRunningInCheckOnlyMode():
   return "--check-only" in sys.argv
 
@@ -124,29 +164,37 @@ def colorsFolderPath():
   else:
     # Find color source files folder
     iosRootPath = pathlib.Path(__file__).absolute().parent.parent.parent
-    return next(iosRootPath.rglob(f'{source_filename_plural}.swift')).parent
+    return find_source_folder(iosRootPath, f'{source_filename_plural}.swift')
 
 if __name__ == "__main__":
 
-  colors = get_updated_colors()
+  spec = fetch_cached(ORBIT_URL, 'theo-spec.json')
 
   colorsFolder = colorsFolderPath()
   codePath = colorsFolder.joinpath(f'{source_filename_plural}.swift')
   codePathUIColor = colorsFolder.joinpath(f'UI{source_filename_plural}.swift')
+
+  if isRunningInCheckOnlyMode():
+    # Skip the regeneration when neither the design tokens nor the sources changed since the last successful check
+    checkedState = checked_state(spec, [codePath, codePathUIColor])
+    if is_checked_state_unchanged(checkedState):
+      sys.exit(0)
+
+  colors = get_updated_colors(spec)
   assetPath = colorsFolder.joinpath(f'{source_filename_plural}.xcassets')
+  # The xcassets folder is generated aside and swapped in once complete
+  stagingAssetPath = colorsFolder.joinpath(f'.{source_filename_plural}.xcassets.staging')
 
   if not isRunningInCheckOnlyMode():
-    # Recreate the xcassets folder
-    shutil.rmtree(assetPath, ignore_errors = True)
-    assetPath.mkdir(exist_ok = True)
+    shutil.rmtree(stagingAssetPath, ignore_errors = True)
 
-    # Create generic xcassets header
-    with open(assetPath.joinpath(contents_filename), "w") as contentsFile:
-      contentsFile.write(xcassets_header)
+  # Create generic xcassets header
+  pendingFiles = [(stagingAssetPath.joinpath(contents_filename), xcassets_header)]
 
-  sourceColorLines = []
-  sourceUIColorLines = []
+  sourceColorLines = io.StringIO()
+  sourceUIColorLines = io.StringIO()
   lastColorGroup = ''
+  writtenGroups = set()
 
   for key, value in sorted(colors.items()):
       
@@ -161,42 +209,40 @@ if __name__ == "__main__":
 
       description = " ".join(key_tokens[0:])
 
-      colors = re.findall(r'\d+', value)
+      colors = digits_regex.findall(value)
       assert len(colors) == 3, "Expected 3 decimal RGB values from JSON"
       colors_inverse = get_inversed_colors(colors)
       rgb_hex_colors = list(map(lambda c: str_to_hexa(c), colors))
       rgb_hex_inverse_colors = list(map(lambda c: str_to_hexa(c), colors_inverse))
 
       if group != lastColorGroup:
-        sourceColorLines.append(source_group_template.format(group = group))
-        sourceUIColorLines.append(source_group_template.format(group = group))
+        sourceColorLines.write(f'\n    // MARK: - {group}\n')
+        sourceUIColorLines.write(f'\n    // MARK: - {group}\n')
         lastColorGroup = group
 
-      sourceColorLines.append(source_line_template.format(name = name, description = description))
-      sourceUIColorLines.append(source_line_template_uicolor.format(name = name, description = description))
+      sourceColorLines.write(f'    /// Orbit {description} color.\n    static let {name} = Color("{description}", bundle: .current)\n')
+      sourceUIColorLines.write(f'    /// Orbit {description} color.\n    static let {name} = fromResource(named: "{description}")\n')
 
       if isRunningInCheckOnlyMode():
         continue
 
-      groupPath = assetPath.joinpath(group)
+      groupPath = stagingAssetPath.joinpath(group)
       colorSetPath = groupPath.joinpath(f'{description}.colorset')
 
-      groupPath.mkdir(exist_ok = True)
-      colorSetPath.mkdir(exist_ok = True)
-
-      # Create generic xcassets header
-      with open(groupPath.joinpath(contents_filename), "w") as contentsFile:
-          contentsFile.write(xcassets_header)
+      # Create generic xcassets header, once per group
+      if group not in writtenGroups:
+        pendingFiles.append((groupPath.joinpath(contents_filename), xcassets_header))
+        writtenGroups.add(group)
 
       # Create color definition file
-      with open(colorSetPath.joinpath(contents_filename), "w") as colorSetFile:
-          colorSetFile.write(xcassets_color_template.format(
-            R = rgb_hex_colors[0], G = rgb_hex_colors[1], B = rgb_hex_colors[2],
-            iR = rgb_hex_inverse_colors[0], iG = rgb_hex_inverse_colors[1], iB = rgb_hex_inverse_colors[2])
-          )
+      pendingFiles.append((colorSetPath.joinpath(contents_filename), xcassets_color_contents(
+        R = rgb_hex_colors[0], G = rgb_hex_colors[1], B = rgb_hex_colors[2],
+        iR = rgb_hex_inverse_colors[0], iG = rgb_hex_inverse_colors[1], iB = rgb_hex_inverse_colors[2])
+      ))
 
-  updatedSourceContent = source_template.format(colorList = '\n'.join(sourceColorLines))
-  updatedSourceContentUIColor = source_template_uicolor.format(colorList = '\n'.join(sourceUIColorLines))
+  # The templates already provide the newline after the last color
+  updatedSourceContent = source_template.format(colorList = sourceColorLines.getvalue().rstrip('\n'))
+  updatedSourceContentUIColor = source_template_uicolor.format(colorList = sourceUIColorLines.getvalue().rstrip('\n'))
 
   if isRunningInCheckOnlyMode():
     isUpdateAvailable = updatedSourceContent != open(codePath).read() or updatedSourceContentUIColor != open(codePathUIColor).read()
@@ -204,12 +250,22 @@ if __name__ == "__main__":
 
     if isUpdateAvailable:
       exitCode = 1
+    else:
+      save_checked_state(checkedState)
 
     sys.exit(exitCode)
 
+  write_files(pendingFiles)
+
+  # Replace the xcassets folder
+  shutil.rmtree(assetPath, ignore_errors = True)
+  os.rename(stagingAssetPath, assetPath)
+
   # Recreate the color extensions source file
   with open(codePath, "w") as sourceFile:
       sourceFile.write(updatedSourceContent)
 
   with open(codePathUIColor, "w") as sourceFile:
       sourceFile.write(updatedSourceContentUIColor)
+
+  save_checked_state(checked_state(spec, [codePath, codePathUIColor]))
@@ -9,11 +9,13 @@ This script:
 """
 
 import sys
-import os
+import io
 import pathlib
-import shutil
+import zipfile
 import xml.etree.ElementTree as elementTree
-import urllib.request
+from common import fetch_cached
+
+ICONS_FONT_URL = "https://unpkg.com/@kiwicom/orbit-components%40latest/orbit-icons-font.zip"
 
 source_header = '''
 // Generated by 'Automation/update_icons.py'
@@ -45,12 +47,22 @@ def kebab_case_to_camel_case(string):
     
 def dictionary_from_xml(path):
     
-    tree = elementTree.parse(path)
-    root = tree.getroot()
+    values = {}
+    
+    parents = []
     
-    pairs = [(x.attrib["glyph-name"], x.attrib["unicode"]) for x in root.findall(".//{*}glyph")]
+    # Stream the glyphs and detach each one once read, so the parsed tree does not grow with the glyph count
+    for event, element in elementTree.iterparse(path, events = ("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if element.tag.rpartition("}")[2] == "glyph":
+            values[element.attrib["glyph-name"]] = element.attrib["unicode"]
+            if parents:
+                parents[-1].remove(element)
     
-    return { k: v for (k, v) in pairs }
+    return values
 
 if __name__ == "__main__":
     
@@ -59,16 +71,10 @@ if __name__ == "__main__":
     icons_content_swift_path = icons_folder.joinpath("Icon.Content+Extensions.swift")
     icon_font_path = icons_folder.joinpath("Icons.ttf")
     
-    zip_name = "font.zip"
-    unzipped_folder_name = "orbit-icons-font"
-    urllib.request.urlretrieve("https://unpkg.com/@kiwicom/orbit-components%40latest/orbit-icons-font.zip", zip_name)  
-    shutil.unpack_archive(zip_name, ".")    
-    
-    shutil.copyfile(f"{unzipped_folder_name}/orbit-icons.ttf", icon_font_path)    
-    icon_values = dictionary_from_xml(f"{unzipped_folder_name}/orbit-icons.svg")
-    
-    os.remove(zip_name)
-    shutil.rmtree(unzipped_folder_name)
+    with zipfile.ZipFile(io.BytesIO(fetch_cached(ICONS_FONT_URL, "orbit-icons-font.zip"))) as font_archive:
+        icon_font_path.write_bytes(font_archive.read("orbit-icons-font/orbit-icons.ttf"))
+        with font_archive.open("orbit-icons-font/orbit-icons.svg") as svg_file:
+            icon_values = dictionary_from_xml(svg_file)
 
     case_lines = []
     value_lines = []
@@ -82,13 +88,7 @@ if __name__ == "__main__":
         
         swift_icon_name = kebab_case_to_camel_case(icon_name)
         
-        encoded_value = value.encode("unicode_escape")
-        
-        if "\\u" in str(encoded_value):
-            inner_value = str(encoded_value).split("'")[1].split("u")[-1]            
-        else:
-            inner_value = hex(ord(value))[2:].zfill(4)
-        
+        inner_value = format(ord(value[0]), "04x")
         swift_value = f"\\u{{{inner_value}}}"
         
         case_lines.append(f"        /// Orbit `{swift_icon_name}` icon symbol.\n        case {swift_icon_name}")
@@ -13,7 +13,11 @@ import re
 import pathlib
 import shutil
 import time
-from urllib.request import urlretrieve
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urljoin
+from common import RETRY_STATUSES, MAX_RETRIES, retry_delay, find_source_folder
 
 content_template = '''{{
   "images" : [
@@ -43,29 +47,107 @@ content_template = '''{{
 sizes = [200, 400, 600]
 illustration_url_template = 'https://images.kiwi.com/illustrations/0x{size}/{illustrationName}.png'
 source_filename = 'Illustrations'
+case_regex = re.compile(r'case\s+(\w+)')
+
+throttling_statuses = {429, 503}
+redirect_statuses = {301, 302, 303, 307, 308}
+max_redirects = 5
+
+connections = threading.local()
+
+class AdaptiveRateLimiter:
+  # Paces requests of all workers, the rate grows additively with successful responses and halves when throttled
+  def __init__(self, rate, minRate, maxRate):
+    self.rate = rate
+    self.minRate = minRate
+    self.maxRate = maxRate
+    self.nextSlot = time.monotonic()
+    self.lock = threading.Lock()
+
+  def wait(self):
+    with self.lock:
+      now = time.monotonic()
+      slot = max(now, self.nextSlot)
+      self.nextSlot = slot + 1.0 / self.rate
+    time.sleep(slot - now)
+
+  def succeeded(self):
+    with self.lock:
+      # Roughly +1 request per second for every second of successful requests
+      self.rate = min(self.maxRate, self.rate + 1.0 / self.rate)
+
+  def throttled(self, delay):
+    with self.lock:
+      self.rate = max(self.minRate, self.rate / 2)
+      self.nextSlot = max(self.nextSlot, time.monotonic() + delay)
+
+rate_limiter = AdaptiveRateLimiter(rate = 8, minRate = 1, maxRate = 32)
 
 def uppercase_first_letter(s):
   return s[:1].upper() + s[1:] if str else ''
 
 def get_illustration_names(codePath):
-  p = re.compile(r'case\s+(\w+)')
-  names = []
-  with open(codePath, 'r') as illustrationCode:
-    for line in illustrationCode:
-      for case in p.findall(line):
-        if case == 'none':
-          continue
-        names.append(uppercase_first_letter(case))
-  return names
+  return [uppercase_first_letter(case) for case in case_regex.findall(codePath.read_text()) if case != 'none']
+
+def illustration_connection(url):
+  # Keep persistent connections per worker thread, so TLS sessions are reused across downloads
+  if getattr(connections, 'value', None) is None:
+    connections.value = {}
+  scheme, host = urlsplit(url)[:2]
+  if (scheme, host) not in connections.value:
+    connectionClass = http.client.HTTPConnection if scheme == 'http' else http.client.HTTPSConnection
+    connections.value[(scheme, host)] = connectionClass(host, timeout = 30)
+  return connections.value[(scheme, host)]
+
+def get_following_redirects(url):
+  # Redirects are followed the same way urlretrieve did, reusing the connection for the same host
+  for _ in range(max_redirects + 1):
+    connection = illustration_connection(url)
+    target = urlsplit(url)
+    try:
+      connection.request('GET', target.path + (f'?{target.query}' if target.query else ''))
+      response = connection.getresponse()
+      data = response.read()
+    except (OSError, http.client.HTTPException):
+      # Drop the connection, it will be reopened by the next request
+      connection.close()
+      raise
+    location = response.getheader('Location')
+    if response.status not in redirect_statuses or not location:
+      break
+    url = urljoin(url, location)
+  return response, data
 
 def download_illustration(illustrationName, sizeIndex, assetDownloadedPath):
   url = illustration_url_template.format(illustrationName = illustrationName, size = sizes[sizeIndex-1])
   path = assetDownloadedPath.joinpath("{illustrationName}@{sizeIndex}x.png".format(illustrationName = illustrationName, sizeIndex = sizeIndex))
   print("Downloading [{url}] -> [{path}] ...".format(url = url, path = path))
-  try:
-    urlretrieve(url, path)
-  except Exception as e:
-    print(f'❗️{e}')
+
+  for attempt in range(MAX_RETRIES + 1):
+    rate_limiter.wait()
+    try:
+      response, data = get_following_redirects(url)
+    except (OSError, http.client.HTTPException) as e:
+      error = e
+      retryAfter = None
+    else:
+      if 200 <= response.status < 300:
+        rate_limiter.succeeded()
+        path.write_bytes(data)
+        return
+      error = f'HTTP Error {response.status}: {response.reason}'
+      if response.status not in RETRY_STATUSES:
+        break
+      retryAfter = response.getheader('Retry-After')
+      if response.status in throttling_statuses:
+        # Slow down all workers, not just this one
+        rate_limiter.throttled(retry_delay(attempt, retryAfter))
+        continue
+
+    if attempt < MAX_RETRIES:
+      time.sleep(retry_delay(attempt, retryAfter))
+
+  print(f'❗️{error}')
 
 def illustrationsFolderPath():
   if len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
@@ -75,7 +157,18 @@ def illustrationsFolderPath():
   else:
     # Find source files folder
     iosRootPath = pathlib.Path(__file__).absolute().parent.parent.parent
-    return next(iosRootPath.rglob(f'{source_filename}.swift')).parent
+    return find_source_folder(iosRootPath, f'{source_filename}.swift')
+
+def update_illustration(illustration, assetDownloadedPath):
+  folderPath = assetDownloadedPath.joinpath("{illustration}.imageset/".format(illustration = illustration))
+  folderPath.mkdir(exist_ok = True)
+
+  # Create definition file
+  with open(folderPath.joinpath('Contents.json'), "w") as contentFile:
+    contentFile.write(content_template.format(name = illustration))
+
+  for sizeIndex in range(1, 4):
+    download_illustration(illustration, sizeIndex, folderPath)
 
 if __name__ == "__main__":
 
@@ -84,15 +177,6 @@ if __name__ == "__main__":
   assetDownloadedPath = folder.joinpath('../Illustrations/Illustrations.xcassets/')
   assetDownloadedPath.mkdir(exist_ok = True)
 
-  for illustration in get_illustration_names(codePath):
-
-    folderPath = assetDownloadedPath.joinpath("{illustration}.imageset/".format(illustration = illustration))
-    folderPath.mkdir(exist_ok = True)
-
-    # Create definition file
-    with open(folderPath.joinpath('Contents.json'), "w") as contentFile:
-      contentFile.write(content_template.format(name = illustration))
-
-    for sizeIndex in range(1, 4):
-      download_illustration(illustration, sizeIndex, folderPath)
-      time.sleep(0.3)
+  # Downloads are network-bound, so process several illustrations at once
+  with ThreadPoolExecutor(max_workers = min(8, (os.cpu_count() or 1) * 2)) as executor:
+    list(executor.map(lambda illustration: update_illustration(illustration, assetDownloadedPath), get_illustration_names(codePath)))